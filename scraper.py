@@ -14,18 +14,42 @@ Filters applied:
 Environment variables:
   MITIKA_USERNAME
   MITIKA_PASSWORD
+  MITIKA_NETWORK_MODE        (optional) "record" or "replay"
+  MITIKA_HAR_FILE            (optional) HAR path, default output/mitika_session.har
+  MITIKA_REPLAY_TIME_SCALE   (optional) replay latency factor, 0 = instant
+  MITIKA_LEAN_BROWSER        (optional) "1" for the low-memory Chromium profile
+  MITIKA_SINGLE_RENDERER     (optional) "1" to cap Chromium at one renderer process
+  MITIKA_MEM_SAMPLE_SECS     (optional) RSS sampling interval, default 2
+  MITIKA_POSTPROCESS         (optional) "0" to skip convert/validate/compress
+  MITIKA_RUN_DEADLINE_SECS   (optional) wall-clock budget for the browser run, default 900
+  MITIKA_LATENCY_FILE        (optional) latency history, default .latency_history.json
 
 Usage:
   python scraper.py
+
+Offline debugging:
+  MITIKA_NETWORK_MODE=record python scraper.py   # live run, traffic saved to HAR
+  MITIKA_NETWORK_MODE=replay python scraper.py   # no network, served from HAR
 """
 
+import base64
+import csv
+import gzip
+import json
 import os
+import re
+import shutil
 import time
+import threading
 import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from html.parser import HTMLParser
+from urllib.parse import parse_qs, parse_qsl, quote, quote_plus, urlencode
 from datetime import datetime, timedelta, timezone
 
 # Timezone: Argentina (UTC-3)
 AR_TZ = timezone(timedelta(hours=-3))
+from openpyxl import load_workbook
 from playwright.sync_api import sync_playwright, TimeoutError as PwTimeout
 
 # ======================================================
@@ -47,9 +71,25 @@ LOGIN_URL = (
 BOOKINGS_URL = "https://mitika.travel/admin/bookings/List.xhtml"
 SERVICES_URL = "https://mitika.travel/admin/bookings/List.xhtml?view=services"
 
+NETWORK_MODE = os.environ.get("MITIKA_NETWORK_MODE", "").strip().lower()
+HAR_FILE = os.environ.get("MITIKA_HAR_FILE") or os.path.join(OUTPUT_DIR, "mitika_session.har")
+# Playwright does not reliably embed bodies of responses that become downloads,
+# so recorded downloads are kept next to the HAR and served from there on replay
+HAR_DOWNLOADS_DIR = HAR_FILE + ".downloads"
+HAR_DOWNLOADS_MANIFEST = os.path.join(HAR_DOWNLOADS_DIR, "manifest.json")
+REPLAY_TIME_SCALE = float(os.environ.get("MITIKA_REPLAY_TIME_SCALE", "0"))
+
+if NETWORK_MODE not in ("", "record", "replay"):
+    raise RuntimeError("MITIKA_NETWORK_MODE must be 'record' or 'replay'")
+
 USERNAME = os.environ.get("MITIKA_USERNAME")
 PASSWORD = os.environ.get("MITIKA_PASSWORD")
 
+# Recorded traffic is redacted, so replay runs never need real credentials
+if NETWORK_MODE == "replay":
+    USERNAME = USERNAME or "replay-user"
+    PASSWORD = PASSWORD or "replay-password"
+
 if not USERNAME or not PASSWORD:
     raise RuntimeError("MITIKA_USERNAME and MITIKA_PASSWORD must be set")
 
@@ -62,10 +102,184 @@ BOOKINGS_FILE = os.path.join(OUTPUT_DIR, f"BOOKINGS_{STAMP}.xlsx")
 SERVICES_FILE = os.path.join(OUTPUT_DIR, f"SERVICES_{STAMP}.xlsx")
 PARAMS_FILE = os.path.join(OUTPUT_DIR, f"FILTER_PARAMS_{STAMP}.txt")
 
-# Timeouts (ms)
+# Browser profile
+LEAN_BROWSER = os.environ.get("MITIKA_LEAN_BROWSER", "") == "1"
+SINGLE_RENDERER = os.environ.get("MITIKA_SINGLE_RENDERER", "") == "1"
+MEM_SAMPLE_SECS = float(os.environ.get("MITIKA_MEM_SAMPLE_SECS", "2"))
+
+DEFAULT_VIEWPORT = {"width": 1920, "height": 1080}
+LEAN_VIEWPORT = {"width": 1280, "height": 800}
+LEAN_CHROMIUM_ARGS = [
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-dev-shm-usage",
+    "--no-first-run",
+    "--mute-audio",
+    "--disk-cache-size=16777216",
+    "--media-cache-size=1",
+]
+
+# Post-processing of the exported workbooks
+POSTPROCESS = os.environ.get("MITIKA_POSTPROCESS", "1") != "0"
+POSTPROCESS_TASKS = ("convert", "validate", "compress")
+
+# Timeouts (ms) — upper bounds; the run budget may hand out less
 NAV_TIMEOUT = 60_000
 AJAX_TIMEOUT = 30_000
 CLICK_TIMEOUT = 15_000
+IDLE_TIMEOUT = 15_000
+DOWNLOAD_TIMEOUT = 60_000
+
+# Run budget
+RUN_DEADLINE_SECS = float(os.environ.get("MITIKA_RUN_DEADLINE_SECS", "900"))
+LATENCY_FILE = os.environ.get("MITIKA_LATENCY_FILE") or os.path.join(BASE_DIR, ".latency_history.json")
+LATENCY_HISTORY = 50         # samples kept per kind
+LATENCY_MIN_SAMPLES = 5      # below this, nominal timeouts are used
+LATENCY_HEADROOM = 4         # adaptive timeout = p95 × headroom
+NOMINAL_TIMEOUTS = {
+    "nav": NAV_TIMEOUT,
+    "settle": NAV_TIMEOUT,
+    "ajax": AJAX_TIMEOUT,
+    "form": AJAX_TIMEOUT,
+    "click": CLICK_TIMEOUT,
+    "idle": IDLE_TIMEOUT,
+    "download": DOWNLOAD_TIMEOUT,
+}
+# Only operations that fail loudly on timeout adapt. Waits that log and carry
+# on (ajax, idle, form, settle) keep their nominal timeout: shortened, they
+# would let the run read the page mid-update and export wrong data.
+MIN_TIMEOUTS = {"nav": 10_000, "click": 3_000, "download": 15_000}
+# Fraction of the *remaining* run time each step may use
+STEP_SHARES = {"login": 0.3, "filters": 0.5, "export_bookings": 0.5, "export_services": 1.0}
+
+
+# ======================================================
+# RUN BUDGET
+# ======================================================
+
+class BudgetExhausted(RuntimeError):
+    """The run deadline or the current step's budget ran out."""
+
+
+class RunBudget:
+    """Run-wide deadline handing out per-call timeouts.
+
+    Each step gets a share of the time still left when it begins, so later
+    steps shrink when earlier ones ran long. Within a step, a timeout is the
+    nominal constant, lowered to p95 × headroom of the latencies seen in
+    recent runs, and always capped by what is left of the step. Asking for a
+    timeout once the budget is spent raises BudgetExhausted.
+    """
+
+    def __init__(self, total_secs, history_path):
+        self.total_ms = total_secs * 1000
+        self.history_path = history_path
+        self.history = {}
+        self.log = []
+        self.started = None
+        self.step_name = None
+        self.step_deadline = None
+        self.page = None
+
+    def start(self):
+        self.started = time.monotonic()
+        try:
+            with open(self.history_path, encoding="utf-8") as f:
+                self.history = json.load(f)
+        except (OSError, ValueError):
+            self.history = {}
+
+    def elapsed_ms(self):
+        return (time.monotonic() - self.started) * 1000
+
+    def remaining_ms(self):
+        run_left = self.total_ms - self.elapsed_ms()
+        if self.step_deadline is None:
+            return run_left
+        return min(run_left, (self.step_deadline - time.monotonic()) * 1000)
+
+    def begin_step(self, name, page=None):
+        """Start a step; with a page, its default timeout tracks the step budget too."""
+        self.page = page or self.page
+        run_left = self.total_ms - self.elapsed_ms()
+        self.step_name = name
+        self.step_deadline = time.monotonic() + run_left * STEP_SHARES.get(name, 1.0) / 1000
+        self.check(f"start of {name}")
+        print(f"  ⏱ {name}: {self.remaining_ms() / 1000:.0f}s budget "
+              f"({run_left / 1000:.0f}s left in run)")
+
+    def adaptive_ms(self, kind):
+        nominal = NOMINAL_TIMEOUTS[kind]
+        samples = sorted(self.history.get(kind, []))
+        if kind not in MIN_TIMEOUTS or len(samples) < LATENCY_MIN_SAMPLES:
+            return nominal
+        p95 = samples[min(int(len(samples) * 0.95), len(samples) - 1)]
+        return max(MIN_TIMEOUTS[kind], min(nominal, p95 * LATENCY_HEADROOM))
+
+    def timeout(self, kind, what=""):
+        """Timeout in ms for one operation of the given kind."""
+        self.check(what or kind)
+        # Playwright treats 0 as "no timeout", so never hand it out
+        return max(1, int(min(self.adaptive_ms(kind), self.remaining_ms())))
+
+    def check(self, what):
+        remaining = self.remaining_ms()
+        if remaining <= 0:
+            raise BudgetExhausted(self.diagnostic(what))
+        # Unbudgeted calls (fill, evaluate, count, screenshot…) use the page default
+        if self.page is not None:
+            self.page.set_default_timeout(max(1, int(min(AJAX_TIMEOUT, remaining))))
+
+    def timed(self, kind, what, action):
+        """Run action(timeout_ms) under a budgeted timeout and record its latency."""
+        timeout = self.timeout(kind, what)
+        start = time.monotonic()
+        try:
+            result = action(timeout)
+        except PwTimeout:
+            self.record(kind, what, (time.monotonic() - start) * 1000, True)
+            raise
+        self.record(kind, what, (time.monotonic() - start) * 1000)
+        return result
+
+    def sleep(self, seconds, what="fixed wait"):
+        """time.sleep that never runs past the budget."""
+        self.check(what)
+        time.sleep(min(seconds, self.remaining_ms() / 1000))
+
+    def record(self, kind, what, ms, timed_out=False):
+        """Log an operation's latency and feed it into the history."""
+        self.log.append((self.step_name, kind, what, ms, timed_out))
+        samples = self.history.setdefault(kind, [])
+        samples.append(round(ms))
+        del samples[:-LATENCY_HISTORY]
+
+    def diagnostic(self, what):
+        run_left = self.total_ms - self.elapsed_ms()
+        scope = "Step budget" if run_left > 0 else "Run budget"
+        lines = [
+            f"{scope} exhausted during step '{self.step_name}' at '{what}': "
+            f"{self.elapsed_ms() / 1000:.1f}s elapsed of {self.total_ms / 1000:.0f}s.",
+            "Recent operations:",
+        ]
+        for step, kind, op, ms, timed_out in self.log[-8:]:
+            flag = " (timed out)" if timed_out else ""
+            lines.append(f"  - [{step}] {kind} {op}: {ms / 1000:.1f}s{flag}")
+        return "\n".join(lines)
+
+    def save(self):
+        try:
+            with open(self.history_path, "w", encoding="utf-8") as f:
+                json.dump(self.history, f)
+        except OSError as e:
+            print(f"  ⚠ Could not save latency history: {e}")
+
+
+BUDGET = RunBudget(RUN_DEADLINE_SECS, LATENCY_FILE)
 
 
 # ======================================================
@@ -81,27 +295,45 @@ def screenshot(page, name):
         print(f"  ⚠ Screenshot failed: {e}")
 
 
-def safe_goto(page, url, timeout=NAV_TIMEOUT):
+def wait_for_idle(page, what="networkidle"):
+    """Best-effort networkidle wait, bounded by the run budget."""
+    try:
+        BUDGET.timed("idle", what, lambda t: page.wait_for_load_state("networkidle", timeout=t))
+    except PwTimeout:
+        # Cut short by the budget rather than by a busy page: stop here
+        BUDGET.check(what)
+
+
+def safe_goto(page, url, timeout=None):
     """Navigate to a URL, handling ERR_ABORTED from JSF redirects gracefully."""
+    timeout = timeout or BUDGET.timeout("nav", url)
+    start = time.monotonic()
+    timed_out = False
     try:
         page.goto(url, timeout=timeout, wait_until="domcontentloaded")
     except Exception as e:
+        timed_out = isinstance(e, PwTimeout)
         if "ERR_ABORTED" in str(e):
             print(f"  ⚠ Navigation interrupted (ERR_ABORTED) — waiting for page to settle…")
             try:
-                page.wait_for_load_state("domcontentloaded", timeout=timeout)
+                page.wait_for_load_state(
+                    "domcontentloaded", timeout=BUDGET.timeout("settle", url)
+                )
             except PwTimeout:
-                pass
+                timed_out = True
+                BUDGET.check(f"settle after {url}")
         else:
             raise
-    try:
-        page.wait_for_load_state("networkidle", timeout=15_000)
-    except PwTimeout:
-        pass
+    finally:
+        BUDGET.record("nav", url, (time.monotonic() - start) * 1000, timed_out)
+    wait_for_idle(page, f"networkidle after {url}")
 
 
-def wait_for_ajax(page, timeout=AJAX_TIMEOUT):
+def wait_for_ajax(page, timeout=None):
     """Wait until PrimeFaces Ajax queue is idle."""
+    timeout = timeout or BUDGET.timeout("ajax")
+    start = time.monotonic()
+    timed_out = False
     try:
         page.wait_for_function(
             """() => {
@@ -113,11 +345,14 @@ def wait_for_ajax(page, timeout=AJAX_TIMEOUT):
             timeout=timeout,
         )
     except PwTimeout:
+        timed_out = True
+        BUDGET.record("ajax", "PrimeFaces queue", (time.monotonic() - start) * 1000, timed_out)
+        # Cut short by the budget: reading the page now would export a half-updated table
+        BUDGET.check("PrimeFaces Ajax queue")
         print("  ⚠ PrimeFaces Ajax wait timed out — continuing anyway")
-    try:
-        page.wait_for_load_state("networkidle", timeout=10_000)
-    except PwTimeout:
-        pass
+    else:
+        BUDGET.record("ajax", "PrimeFaces queue", (time.monotonic() - start) * 1000)
+    wait_for_idle(page, "networkidle after Ajax")
 
 
 def js_click(page, selector):
@@ -135,6 +370,32 @@ def js_click(page, selector):
     return clicked
 
 
+def read_pager(page):
+    """Visible row count and .ui-paginator-current text of the results table."""
+    return page.evaluate("""() => {
+        const rows = document.querySelectorAll('table tbody tr');
+        const pager = document.querySelector('.ui-paginator-current');
+        return {
+            rowCount: rows.length,
+            pagerText: pager ? pager.textContent.trim() : 'no pager'
+        };
+    }""")
+
+
+def parse_pager_total(text):
+    """Total record count from a range report like '1 - 20 de 1.234', or None.
+
+    Only the '{first} - {last} de {total}' form carries a record total; page
+    reports such as '(1 de 12)' or 'Página 1 de 12' count pages and yield None.
+    """
+    match = re.search(
+        r"\d[\d.,]*\s*(?:-|–|a|to)\s*\d[\d.,]*\s+(?:de|of)\s+(\d[\d.,]*)", text
+    )
+    if not match:
+        return None
+    return int(re.sub(r"[.,]", "", match.group(1)))
+
+
 def save_filter_params():
     """Write a companion .txt with the filters used."""
     lines = [
@@ -171,37 +432,579 @@ def save_filter_params():
     print(f"  📝 Filter params saved: {PARAMS_FILE}")
 
 
+# ======================================================
+# BROWSER PROFILE & MEMORY
+# ======================================================
+
+def browser_launch_options():
+    """Chromium launch options for the configured profile."""
+    args = []
+    if LEAN_BROWSER:
+        args += LEAN_CHROMIUM_ARGS
+    if SINGLE_RENDERER:
+        args.append("--renderer-process-limit=1")
+    return {"headless": True, "args": args}
+
+
+def _read_rss_kb(pid):
+    """Resident set size of a process in kB, or 0 if it is gone."""
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def _read_pss_kb(pid):
+    """Proportional set size in kB (shared pages split between their users).
+
+    Falls back to RSS on kernels without smaps_rollup (< 4.14).
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return _read_rss_kb(pid)
+
+
+def _descendant_pids(root_pid):
+    """All live descendants of root_pid, read from /proc."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", encoding="ascii") as f:
+                # comm may contain spaces, so ppid is read after its closing ')'
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    pids, stack = [], [root_pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            pids.append(child)
+            stack.append(child)
+    return pids
+
+
+class MemorySampler:
+    """Background thread sampling Python and browser memory, keeping the peaks.
+
+    "Browser" is every descendant of this process: the Playwright driver plus
+    all Chromium processes. It is summed as PSS, so libraries and shared memory
+    mapped by several Chromium processes count once rather than per process.
+    Linux only; elsewhere the sampler stays idle.
+    """
+
+    def __init__(self, interval=MEM_SAMPLE_SECS):
+        self.interval = interval
+        self.enabled = os.path.isdir("/proc/self")
+        self.peak_python_kb = 0
+        self.peak_browser_kb = 0
+        self.peak_total_kb = 0
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="mem-sampler", daemon=True)
+
+    def sample(self):
+        pid = os.getpid()
+        python_kb = _read_rss_kb(pid)
+        browser_kb = sum(_read_pss_kb(child) for child in _descendant_pids(pid))
+        self.peak_python_kb = max(self.peak_python_kb, python_kb)
+        self.peak_browser_kb = max(self.peak_browser_kb, browser_kb)
+        self.peak_total_kb = max(self.peak_total_kb, python_kb + browser_kb)
+        self.samples += 1
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self.enabled:
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self.enabled:
+            self._stop.set()
+            self._thread.join()
+            self.sample()
+
+    def report(self):
+        if not self.enabled:
+            print("  ⚠ Memory sampling unavailable (no /proc)")
+            return
+        print(
+            f"  📊 Peak memory — python RSS: {self.peak_python_kb / 1024:.0f} MB, "
+            f"browser PSS: {self.peak_browser_kb / 1024:.0f} MB, "
+            f"total: {self.peak_total_kb / 1024:.0f} MB ({self.samples} samples)"
+        )
+
+
+# ======================================================
+# NETWORK RECORD / REPLAY
+# ======================================================
+
+REDACTED = "[REDACTED]"
+SENSITIVE_HEADERS = {"cookie", "set-cookie", "authorization", "proxy-authorization"}
+# Form fields whose values are credentials, matched on the JSF client id
+SECRET_FIELD_RE = re.compile(r"(password|passwd|email|username|user)$", re.I)
+# URL-safe placeholder, so redacted ;jsessionid= URLs still match on replay
+SESSION_ID_RE = re.compile(r"(jsessionid=)[^?#&;\"'\s<>]+", re.I)
+SESSION_REDACTED = "REDACTED"
+# Hop-by-hop / encoding headers no longer valid once the body is decoded from the HAR
+REPLAY_DROP_HEADERS = {"content-length", "content-encoding", "transfer-encoding"}
+
+RECORDED_DOWNLOADS = []
+
+
+def _is_attachment(response):
+    return any(
+        h["name"].lower() == "content-disposition" and "attachment" in h["value"].lower()
+        for h in response.get("headers", [])
+    )
+
+
+def store_recorded_download(url, filepath):
+    """Keep a copy of a downloaded file next to the HAR for replay."""
+    os.makedirs(HAR_DOWNLOADS_DIR, exist_ok=True)
+    name = f"{len(RECORDED_DOWNLOADS):02d}_{os.path.basename(filepath)}"
+    shutil.copyfile(filepath, os.path.join(HAR_DOWNLOADS_DIR, name))
+    RECORDED_DOWNLOADS.append({"url": url, "file": name})
+    with open(HAR_DOWNLOADS_MANIFEST, "w", encoding="utf-8") as f:
+        json.dump(RECORDED_DOWNLOADS, f, indent=2)
+    print(f"  💾 Download kept for replay: {name}")
+
+
+def _redact_value(value, secrets):
+    if isinstance(value, str):
+        for secret in secrets:
+            value = value.replace(secret, REDACTED)
+        return SESSION_ID_RE.sub(r"\g<1>" + SESSION_REDACTED, value)
+    if isinstance(value, list):
+        return [_redact_value(v, secrets) for v in value]
+    if isinstance(value, dict):
+        return {k: _redact_value(v, secrets) for k, v in value.items()}
+    return value
+
+
+def _redact_post_data(post):
+    """Blank credential fields of a form post by name, whatever their encoding."""
+    for param in post.get("params", []):
+        if SECRET_FIELD_RE.search(param.get("name", "")):
+            param["value"] = REDACTED
+    text = post.get("text")
+    if text and "x-www-form-urlencoded" in post.get("mimeType", ""):
+        fields = parse_qsl(text, keep_blank_values=True)
+        if any(SECRET_FIELD_RE.search(name) for name, _ in fields):
+            post["text"] = urlencode([
+                (name, REDACTED if SECRET_FIELD_RE.search(name) else value)
+                for name, value in fields
+            ])
+
+
+def redact_har(path):
+    """Strip credentials, session ids and session cookies from a recorded HAR, in place."""
+    secrets = set()
+    for secret in (USERNAME, PASSWORD):
+        if secret:
+            secrets.update({
+                secret,
+                quote(secret, safe=""),
+                quote_plus(secret),
+                # JavaScript encodeURIComponent, used by PrimeFaces Ajax posts
+                quote(secret, safe="-_.!~*'()"),
+                quote_plus(secret, safe="-_.!~*'()"),
+            })
+    # Longest first, so an encoded form is not left half-replaced by its raw form
+    secrets = sorted(secrets, key=len, reverse=True)
+
+    with open(path, encoding="utf-8") as f:
+        har = _redact_value(json.load(f), secrets)
+
+    for entry in har["log"]["entries"]:
+        if "postData" in entry["request"]:
+            _redact_post_data(entry["request"]["postData"])
+        for part in (entry["request"], entry["response"]):
+            for header in part.get("headers", []):
+                if header["name"].lower() in SENSITIVE_HEADERS:
+                    header["value"] = REDACTED
+            for cookie in part.get("cookies", []):
+                cookie["value"] = REDACTED
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(har, f)
+    print(f"  🔒 HAR redacted: {path} ({len(har['log']['entries'])} entries)")
+
+    empty = [
+        e for e in har["log"]["entries"]
+        if _is_attachment(e["response"]) and not e["response"].get("content", {}).get("text")
+    ]
+    if len(empty) > len(RECORDED_DOWNLOADS):
+        print(f"  ⚠ {len(empty)} attachment response(s) recorded without a body but only "
+              f"{len(RECORDED_DOWNLOADS)} download(s) kept — replay will fail those exports")
+
+
+def install_replay(context, har_path, time_scale=0.0):
+    """Serve every request of the context from a recorded HAR.
+
+    Entries are matched on method + URL (falling back to the URL without its
+    query string) and replayed in recorded order, so repeated PrimeFaces
+    partial requests to the same endpoint get successive responses. With
+    time_scale > 0 each response is delayed by its recorded duration times
+    the factor; 0 serves everything immediately.
+    """
+    with open(har_path, encoding="utf-8") as f:
+        har = json.load(f)
+
+    entries = {}
+    for entry in har["log"]["entries"]:
+        request = entry["request"]
+        entries.setdefault((request["method"], request["url"]), []).append(entry)
+        bare_url = request["url"].split("?")[0]
+        if bare_url != request["url"]:
+            entries.setdefault((request["method"], bare_url), []).append(entry)
+    served = {}
+    misses = []
+
+    downloads = {}
+    if os.path.exists(HAR_DOWNLOADS_MANIFEST):
+        with open(HAR_DOWNLOADS_MANIFEST, encoding="utf-8") as f:
+            for item in json.load(f):
+                downloads.setdefault(item["url"], []).append(item["file"])
+
+    def handle(route, request):
+        key = (request.method, request.url)
+        if key not in entries:
+            key = (request.method, request.url.split("?")[0])
+        candidates = entries.get(key)
+        if not candidates:
+            misses.append(request.url)
+            route.abort("internetdisconnected")
+            return
+
+        index = served.get(key, 0)
+        served[key] = index + 1
+        entry = candidates[min(index, len(candidates) - 1)]
+        response = entry["response"]
+        if response.get("status", 0) <= 0:
+            route.abort("failed")
+            return
+
+        if time_scale > 0:
+            # Blocks the sync dispatcher, which also serialises replayed responses
+            time.sleep(max(entry.get("time", 0), 0) / 1000 * time_scale)
+
+        content = response.get("content", {})
+        body = content.get("text", "")
+        if content.get("encoding") == "base64":
+            body = base64.b64decode(body)
+        else:
+            body = body.encode("utf-8")
+        if not body and _is_attachment(response):
+            kept = downloads.get(request.url)
+            if not kept:
+                # Never hand out an empty workbook: failing the export is the honest result
+                print(f"  ⚠ Replay: attachment from {request.url} has no recorded body")
+                misses.append(request.url)
+                route.abort("failed")
+                return
+            with open(os.path.join(HAR_DOWNLOADS_DIR, kept.pop(0)), "rb") as f:
+                body = f.read()
+        headers = {
+            h["name"]: h["value"]
+            for h in response.get("headers", [])
+            if h["name"].lower() not in REPLAY_DROP_HEADERS
+        }
+        route.fulfill(status=response["status"], headers=headers, body=body)
+
+    context.route("**/*", handle)
+    print(f"  ▶ Replaying {len(har['log']['entries'])} recorded entries from {har_path}"
+          f" (time scale {time_scale:g})")
+    return misses
+
+
 # ======================================================
 # STEPS
 # ======================================================
 
+class LoginError(RuntimeError):
+    """Login did not succeed."""
+
+
+class BadCredentialsError(LoginError):
+    """Wrong username/password, or the account is locked."""
+
+
+class LoginChallengeError(LoginError):
+    """The site asked for a captcha or a second factor."""
+
+
+class MaintenanceError(LoginError):
+    """The site answered with a maintenance / unavailable page."""
+
+
+class SlowServerError(LoginError):
+    """The authentication POST got no response in time."""
+
+
+class LoginFormError(LoginError):
+    """The login form could not be submitted (submit button missing or changed)."""
+
+
+# Checked in this order: a challenge page may also word itself as an error
+LOGIN_ERROR_MARKERS = (
+    (LoginChallengeError, ("captcha", "no soy un robot", "código de verificación",
+                           "verification code", "two-factor", "doble factor")),
+    (MaintenanceError, ("mantenimiento", "maintenance", "temporalmente no disponible",
+                        "service unavailable")),
+    (BadCredentialsError, ("incorrect", "inválid", "invalid", "no coincide",
+                           "no es correcta", "bloquead", "locked", "wrong password")),
+)
+LOGIN_FIELD_SOURCE = re.compile(r"(Email|j_password)$")
+# Redirect targets that are a challenge step, not the app
+CHALLENGE_PATH_RE = re.compile(
+    r"(?:^|[/_.?=&-])(captcha|2fa|mfa|otp|totp|two-?factor|segundo-?factor|"
+    r"verif\w*|challenge)(?:$|[/_.?=&-])",
+    re.I,
+)
+CAPTCHA_CLASS_RE = re.compile(r"\b(g-recaptcha|h-captcha|cf-turnstile)\b")
+CAPTCHA_FRAME_RE = re.compile(r"recaptcha|hcaptcha|challenges\.cloudflare\.com|captcha", re.I)
+OTP_FIELD_RE = re.compile(r"otp|totp|2fa|mfa|one.?time|verif\w*code|codigo", re.I)
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input",
+             "link", "meta", "source", "track", "wbr"}
+
+
+class _MessageTextParser(HTMLParser):
+    """Collects the text of PrimeFaces message containers only."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.depth = 0
+        self.chunks = []
+
+    @staticmethod
+    def _is_container(attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+        return (
+            any(c.startswith(("ui-messages", "ui-message-", "ui-growl")) for c in classes)
+            or (attrs.get("id") or "").endswith(":messages")
+        )
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            return
+        if self.depth or self._is_container(attrs):
+            self.depth += 1
+
+    def handle_endtag(self, tag):
+        if self.depth and tag not in VOID_TAGS:
+            self.depth -= 1
+
+    def handle_data(self, data):
+        if self.depth:
+            self.chunks.append(data)
+
+
+class _ChallengeParser(HTMLParser):
+    """Finds challenge structure: a visible captcha widget/iframe or an OTP input."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.found = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.found:
+            return
+        attrs = {k: v or "" for k, v in attrs}
+        if tag == "iframe" and CAPTCHA_FRAME_RE.search(attrs.get("src", "")):
+            self.found = "captcha iframe"
+        elif CAPTCHA_CLASS_RE.search(attrs.get("class", "")) and attrs.get("data-size") != "invisible":
+            self.found = "captcha widget"
+        elif tag == "input" and attrs.get("type", "text") in ("text", "number", "tel", "password"):
+            if attrs.get("autocomplete") == "one-time-code" or OTP_FIELD_RE.search(
+                f"{attrs.get('id', '')} {attrs.get('name', '')}"
+            ):
+                self.found = "one-time code field"
+
+
+def login_challenge(body, location=""):
+    """What makes this response a captcha/2FA challenge, or None."""
+    match = CHALLENGE_PATH_RE.search(location.split("#")[0])
+    if match:
+        return f"redirect to a {match.group(1)} step ({location})"
+    parser = _ChallengeParser()
+    parser.feed(body.replace("<![CDATA[", "").replace("]]>", ""))
+    return parser.found
+
+
+def login_messages(body):
+    """Text of the message containers (.ui-messages, .ui-growl, [id$=':messages']).
+
+    Handles full pages and PrimeFaces partial responses, including growl
+    messages, which PrimeFaces ships as widget config inside a script.
+    """
+    chunks = []
+
+    def take_message_update(match):
+        if not match.group(1).endswith(":messages"):
+            return match.group(0)
+        chunks.append(re.sub(r"<[^>]*>", " ", match.group(2)))
+        return ""
+
+    # Updates of a messages component are taken whole and kept from the parser
+    body = re.sub(
+        r'<update\s+id="([^"]*)"\s*>\s*<!\[CDATA\[(.*?)\]\]>\s*</update>',
+        take_message_update, body, flags=re.S,
+    )
+    for script in re.findall(r"<script\b[^>]*>(.*?)</script>", body, flags=re.S | re.I):
+        if "Growl" in script:
+            chunks += re.findall(r'(?:summary|detail)\s*:\s*"((?:[^"\\]|\\.)*)"', script)
+
+    parser = _MessageTextParser()
+    parser.feed(body.replace("<![CDATA[", "").replace("]]>", ""))
+    chunks += parser.chunks
+    return " ".join(" ".join(chunks).split())
+
+
+def _is_login_submit(response):
+    """The login form's own submit, not an Ajax call fired by field blur/validation."""
+    request = response.request
+    if request.method != "POST" or "login" not in response.url.lower():
+        return False
+    params = parse_qs(request.post_data or "")
+    if not any(key.startswith("login-form") for key in params):
+        return False
+    source = (params.get("javax.faces.source") or params.get("jakarta.faces.source") or [""])[0]
+    event = (params.get("javax.faces.partial.event")
+             or params.get("jakarta.faces.partial.event") or [""])[0]
+    if event and event not in ("click", "action"):
+        return False
+    return not LOGIN_FIELD_SOURCE.search(source)
+
+
+def classify_login_response(response):
+    """Raise the matching LoginError for the authentication response.
+
+    Returns the redirect target on a clear success, None when the response
+    alone cannot tell (the caller then checks where the page ended up). The
+    redirect decides first, unless it or the page is a challenge step (by
+    structure: challenge path, captcha widget, one-time code field); only
+    then are the page's message containers read, so routine notices
+    elsewhere on a page cannot fail the login.
+    """
+    status = response.status
+    if status in (502, 503):
+        raise MaintenanceError(f"Login POST answered {status} — site unavailable or in maintenance")
+    if status == 504:
+        raise SlowServerError("Login POST answered 504 — gateway timed out")
+    if status >= 400:
+        raise LoginError(f"Login POST answered {status}")
+
+    # Full-page form post: the redirect target says it all
+    location = response.header_value("location") or ""
+    body = ""
+    if not 300 <= status < 400:
+        try:
+            body = response.text()
+        except Exception:
+            pass
+        # PrimeFaces partial response: <redirect url="..."/>
+        match = re.search(r'<redirect\s+url="([^"]+)"', body)
+        if match:
+            location = match.group(1).replace("&amp;", "&")
+
+    challenge = login_challenge(body, location)
+    if challenge:
+        raise LoginChallengeError(f"Login needs a captcha/2FA step: {challenge}")
+
+    if location and "login" not in location.lower():
+        return location
+
+    messages = login_messages(body).lower()
+    for error_class, markers in LOGIN_ERROR_MARKERS:
+        for marker in markers:
+            if marker in messages:
+                raise error_class(f"Login rejected: {messages[:200]!r}")
+
+    if location:
+        raise BadCredentialsError(f"Login redirected back to the login page: {location}")
+    return None
+
+
 def login(page):
     print("[1/4] Logging in...")
     safe_goto(page, LOGIN_URL)
 
     page.fill("#login-form\\:login-content\\:login\\:Email", USERNAME)
     page.fill("#login-form\\:login-content\\:login\\:j_password", PASSWORD)
-    page.click("button:has-text('Siguiente')", timeout=CLICK_TIMEOUT)
 
+    response_timeout = BUDGET.timeout("nav", "login response")
+    start = time.monotonic()
     try:
-        page.wait_for_load_state("networkidle", timeout=NAV_TIMEOUT)
+        with page.expect_response(_is_login_submit, timeout=response_timeout) as response_info:
+            try:
+                BUDGET.timed(
+                    "click", "login submit",
+                    lambda t: page.click("button:has-text('Siguiente')", timeout=t),
+                )
+            except PwTimeout:
+                screenshot(page, "login_submit_missing")
+                raise LoginFormError(
+                    "Could not click the login submit button ('Siguiente') — "
+                    "the login form may have changed"
+                ) from None
+        response = response_info.value
     except PwTimeout:
-        pass
-    time.sleep(3)
+        BUDGET.record("nav", "login response", (time.monotonic() - start) * 1000, True)
+        raise SlowServerError(
+            f"No response to the login POST within {response_timeout / 1000:.0f}s"
+        ) from None
+    BUDGET.record("nav", "login response", (time.monotonic() - start) * 1000)
+    print(f"  ← Login POST {response.status} in {time.monotonic() - start:.1f}s")
+
+    target = classify_login_response(response)
+    if target:
+        print(f"  ✔ Authenticated, redirecting to {target}")
+        try:
+            page.wait_for_url(
+                lambda url: "login" not in url.lower(),
+                timeout=BUDGET.timeout("nav", "post-login redirect"),
+            )
+        except PwTimeout:
+            pass
+        # A later hop of the redirect chain may still land on a challenge step
+        challenge = login_challenge("", page.url)
+        if challenge:
+            raise LoginChallengeError(f"Login needs a captcha/2FA step: {challenge}")
+    wait_for_idle(page, "networkidle after login")
 
     # Dismiss cookie/consent banner if present
     try:
         accept_btn = page.locator("button:has-text('Aceptar todo')")
         if accept_btn.count() > 0:
-            accept_btn.first.click(timeout=5_000)
-            time.sleep(1)
+            BUDGET.timed(
+                "click", "cookie banner",
+                lambda t: accept_btn.first.click(timeout=min(5_000, t)),
+            )
+            BUDGET.sleep(1)
     except PwTimeout:
         pass
 
     screenshot(page, "01_after_login")
 
     if "login" in page.url.lower():
-        raise RuntimeError(f"Login failed. Still on: {page.url}")
+        raise LoginError(f"Login failed. Still on: {page.url}")
 
     print(f"  ✅ Logged in. URL: {page.url}")
 
@@ -210,25 +1013,28 @@ def navigate_to_admin_bookings(page):
     """Robustly navigate to the admin bookings page with retries."""
     max_attempts = 3
     for attempt in range(1, max_attempts + 1):
+        BUDGET.check(f"admin navigation attempt {attempt}")
         if "/admin/bookings" in page.url:
             print(f"  ✔ Already on admin bookings page")
             return
 
         print(f"  → Navigating to admin bookings (attempt {attempt}/{max_attempts})…")
 
+        timeout = BUDGET.timeout("nav", BOOKINGS_URL)
+        start = time.monotonic()
+        timed_out = False
         try:
-            page.goto(BOOKINGS_URL, timeout=NAV_TIMEOUT, wait_until="domcontentloaded")
+            page.goto(BOOKINGS_URL, timeout=timeout, wait_until="domcontentloaded")
         except Exception as e:
+            timed_out = isinstance(e, PwTimeout)
             if "ERR_ABORTED" in str(e):
                 print(f"  ⚠ ERR_ABORTED — page may have redirected")
             else:
                 print(f"  ⚠ Navigation error: {e}")
+        BUDGET.record("nav", BOOKINGS_URL, (time.monotonic() - start) * 1000, timed_out)
 
-        try:
-            page.wait_for_load_state("networkidle", timeout=15_000)
-        except PwTimeout:
-            pass
-        time.sleep(2)
+        wait_for_idle(page, f"networkidle after {BOOKINGS_URL}")
+        BUDGET.sleep(2)
 
         if "/admin/bookings" in page.url:
             print(f"  ✔ Reached admin bookings page")
@@ -237,11 +1043,16 @@ def navigate_to_admin_bookings(page):
         # Last resort: JS redirect
         try:
             page.evaluate(f"window.location.href = '{BOOKINGS_URL}'")
-            page.wait_for_load_state("networkidle", timeout=NAV_TIMEOUT)
-            time.sleep(2)
+            BUDGET.timed(
+                "nav", "JS redirect",
+                lambda t: page.wait_for_load_state("networkidle", timeout=t),
+            )
+            BUDGET.sleep(2)
             if "/admin/bookings" in page.url:
                 print(f"  ✔ Reached admin bookings via JS redirect")
                 return
+        except BudgetExhausted:
+            raise
         except Exception:
             pass
 
@@ -257,30 +1068,44 @@ def apply_filters(page):
     print("[2/4] Applying filters...")
     navigate_to_admin_bookings(page)
     screenshot(page, "02_bookings_loaded")
+    return set_filters(page)
+
 
+def set_filters(page):
+    """Apply all filters on the current bookings/services view; returns the pager total."""
     # ── Open filter panel ──
     print("  Opening filters sidebar...")
     opened = js_click(page, "#clickOtherFilters")
     if not opened:
         # Fallback: try the CSS class used in original scraper
         try:
-            page.locator("a.dev-open-filters").click(timeout=CLICK_TIMEOUT)
+            BUDGET.timed(
+                "click", "open filters",
+                lambda t: page.locator("a.dev-open-filters").click(timeout=t),
+            )
         except PwTimeout:
             # Fallback: try text-based
             try:
-                page.locator("a", has_text="Filtros").click(timeout=CLICK_TIMEOUT)
+                BUDGET.timed(
+                    "click", "open filters by text",
+                    lambda t: page.locator("a", has_text="Filtros").click(timeout=t),
+                )
             except PwTimeout:
                 print("  ⚠ Could not open filter panel")
                 screenshot(page, "filter_panel_fail")
 
     # Wait for filter form
     try:
-        page.wait_for_selector("#search-form", state="visible", timeout=AJAX_TIMEOUT)
+        BUDGET.timed(
+            "form", "filter form",
+            lambda t: page.wait_for_selector("#search-form", state="visible", timeout=t),
+        )
     except PwTimeout:
+        BUDGET.check("filter form")
         print("  ⚠ Filter form did not appear")
         screenshot(page, "filter_form_missing")
 
-    time.sleep(1)
+    BUDGET.sleep(1)
     screenshot(page, "03_filters_opened")
 
     # ── Remove default creation-date filter ──
@@ -297,7 +1122,7 @@ def apply_filters(page):
                 }
             }
         }""")
-    time.sleep(0.5)
+    BUDGET.sleep(0.5)
 
     # ── Set departure dates via PrimeFaces Ajax ──
     print(f"  Setting departure dates: {DATE_FROM} → {DATE_TO}")
@@ -342,12 +1167,22 @@ def apply_filters(page):
     # ── Buscar = Alojamiento (HOTELS) ──
     print("  Setting 'Buscar' to 'Alojamiento'...")
     try:
-        page.get_by_label("Buscar:").select_option("HOTELS")
+        BUDGET.timed(
+            "click", "Buscar by label",
+            lambda t: page.get_by_label("Buscar:").select_option("HOTELS", timeout=t),
+        )
+    except BudgetExhausted:
+        raise
     except Exception:
         try:
-            page.select_option(
-                "select[name='search-form:booking-filters:searchType']", "HOTELS"
+            BUDGET.timed(
+                "click", "Buscar by name",
+                lambda t: page.select_option(
+                    "select[name='search-form:booking-filters:searchType']", "HOTELS", timeout=t
+                ),
             )
+        except BudgetExhausted:
+            raise
         except Exception:
             # Last fallback: JS
             page.evaluate("""() => {
@@ -379,13 +1214,24 @@ def apply_filters(page):
             });
         }"""
     )
-    time.sleep(0.5)
+    BUDGET.sleep(0.5)
     print("  ✔ Estado: Reservado")
 
     screenshot(page, "04_filters_set")
 
     # ── Submit filters ──
     print("  Applying filters...")
+    submit_filters(page)
+
+    screenshot(page, "05_after_apply")
+
+    result = read_pager(page)
+    print(f"  ✅ After apply. Rows: {result['rowCount']}, Pager: {result['pagerText']}")
+    return parse_pager_total(result["pagerText"])
+
+
+def submit_filters(page):
+    """Submit the filter form as it stands and wait for the table to refresh."""
     page.evaluate(
         """() => {
             if (typeof PrimeFaces !== 'undefined') {
@@ -405,6 +1251,8 @@ def apply_filters(page):
         if apply_btn.count() > 0:
             js_click(page, "button.applyFilters")
             wait_for_ajax(page)
+    except BudgetExhausted:
+        raise
     except Exception:
         pass
 
@@ -418,23 +1266,219 @@ def apply_filters(page):
             }
         }
     }""")
-    try:
-        page.wait_for_load_state("networkidle", timeout=10_000)
-    except PwTimeout:
-        pass
-    time.sleep(3)
+    wait_for_idle(page, "networkidle after Aplicar")
+    BUDGET.sleep(3)
+
+
+def read_filter_state(page):
+    """Current values of the filter form, as the server last rendered them."""
+    return page.evaluate("""() => {
+        const form = document.querySelector('#search-form');
+        if (!form) return null;
+        const value = (sel) => {
+            const el = form.querySelector(sel);
+            return el ? el.value : null;
+        };
+        return {
+            dateFrom: value("[id$='departureDateFrom_input']"),
+            dateTo: value("[id$='departureDateTo_input']"),
+            searchType: value("select[name$='searchType']"),
+            statuses: Array.from(
+                form.querySelectorAll(".ui-chkbox input[type='checkbox']")
+            ).filter(cb => cb.checked).map(cb => cb.value),
+        };
+    }""")
 
-    screenshot(page, "05_after_apply")
 
-    result = page.evaluate("""() => {
-        const rows = document.querySelectorAll('table tbody tr');
+def filters_match(state):
+    """True if a read_filter_state() result carries the filters we applied."""
+    if not state:
+        return False
+    return (
+        state["dateFrom"] == DATE_FROM
+        and state["dateTo"] == DATE_TO
+        and state["searchType"] in (None, "HOTELS")
+        and state["statuses"] == ["RESERVED"]
+    )
+
+
+def read_table_signature(page):
+    """Column headers and pager text of the results table, to tell views apart."""
+    return page.evaluate("""() => {
+        const table = document.querySelector('.ui-datatable') || document.querySelector('table');
+        const headers = table
+            ? Array.from(table.querySelectorAll('thead th'))
+                .map(th => th.textContent.trim()).filter(Boolean)
+            : [];
         const pager = document.querySelector('.ui-paginator-current');
         return {
-            rowCount: rows.length,
-            pagerText: pager ? pager.textContent.trim() : 'no pager'
+            headers: headers.join(' | '),
+            pager: pager ? pager.textContent.trim() : '',
         };
     }""")
-    print(f"  ✅ After apply. Rows: {result['rowCount']}, Pager: {result['pagerText']}")
+
+
+def ajax_switch_view(page, view="services", sent_posts=None):
+    """Click the page's own Ajax view toggle; True if the table changed without a reload.
+
+    Only toggles wired to a PrimeFaces/JSF Ajax call are used — a plain link
+    would reload the page, which is exactly what this avoids. A window marker
+    set before the click tells a real in-place update from a navigation. The
+    switch only counts once the results table itself changed (other column
+    headers or pager) or a partial response was served for ?view=<view>;
+    the toggle's own active state is merely reported. Bodies of the POSTs
+    sent meanwhile are appended to sent_posts, if given.
+    """
+    before = read_table_signature(page)
+    view_responses = []
+
+    def on_response(response):
+        if f"view={view}" in response.url:
+            view_responses.append(response.url)
+
+    def on_request(request):
+        if sent_posts is not None and request.method == "POST":
+            sent_posts.append(request.post_data or "")
+
+    page.on("response", on_response)
+    page.on("request", on_request)
+    try:
+        toggled = page.evaluate(
+            """(view) => {
+                const wanted = new RegExp(view === 'services' ? 'servic' : 'booking|reserva', 'i');
+                const candidates = document.querySelectorAll('a, button, li, span.ui-button');
+                for (const el of candidates) {
+                    const onclick = el.getAttribute('onclick') || '';
+                    if (!/PrimeFaces\\.ab|mojarra\\.ab|jsf\\.ajax/.test(onclick)) continue;
+                    const label = [el.id, el.textContent, el.getAttribute('href') || '', onclick].join(' ');
+                    if (!/view/i.test(label) || !wanted.test(label)) continue;
+                    window.__mitikaNoReload = true;
+                    window.__mitikaViewToggleId = el.id;
+                    el.click();
+                    return el.id || el.textContent.trim().slice(0, 40);
+                }
+                return null;
+            }""",
+            view,
+        )
+        if not toggled:
+            print(f"  ⚠ No Ajax toggle found for the {view} view")
+            return False
+
+        print(f"  → Ajax view toggle: {toggled}")
+        wait_for_ajax(page)
+    finally:
+        page.remove_listener("response", on_response)
+        page.remove_listener("request", on_request)
+
+    state = page.evaluate(
+        """() => {
+            const el = window.__mitikaViewToggleId
+                ? document.getElementById(window.__mitikaViewToggleId) : null;
+            // Only the toggle and its own menu item, never the containers around it
+            const own = el ? [el, el.closest('li')].filter(Boolean) : [];
+            return {
+                reloaded: !window.__mitikaNoReload,
+                toggleActive: own.some(
+                    n => /\\b(ui-state-active|active|selected)\\b/.test(n.className)
+                ),
+            };
+        }"""
+    )
+    if state["reloaded"]:
+        print(f"  ⚠ Ajax switch to {view} view reloaded the page")
+        return False
+
+    after = read_table_signature(page)
+    evidence = []
+    if after["headers"] != before["headers"]:
+        evidence.append("columns changed")
+    if after["pager"] != before["pager"]:
+        evidence.append(f"pager {before['pager']!r} → {after['pager']!r}")
+    if view_responses:
+        evidence.append(f"partial response for view={view}")
+    if not evidence:
+        print(f"  ⚠ Ajax switch to {view} view not confirmed: results table unchanged "
+              f"(toggle active: {state['toggleActive']})")
+        return False
+    print(f"  ✔ Table switched ({', '.join(evidence)})")
+    return True
+
+
+def post_carries_filters(post_data):
+    """True if a form post submitted our departure dates with it."""
+    params = parse_qs(post_data or "")
+
+    def field(suffix):
+        return next((v[0] for k, v in params.items() if k.endswith(suffix)), None)
+
+    return (
+        field("departureDateFrom_input") == DATE_FROM
+        and field("departureDateTo_input") == DATE_TO
+    )
+
+
+def table_reflects_filters(page, sent_posts=()):
+    """Check that the results table, not just the form, was rendered with our filters.
+
+    Either a request that rendered the view carried the filter values, or
+    re-submitting the (already verified) form leaves the pager unchanged. If
+    the re-submit changes the pager, the table was unfiltered; a second
+    submit must then leave it stable.
+    """
+    if any(post_carries_filters(post) for post in sent_posts):
+        print("  ✔ View request carried the filters")
+        return True
+
+    before = read_pager(page)["pagerText"]
+    submit_filters(page)
+    after = read_pager(page)["pagerText"]
+    if after == before:
+        print(f"  ✔ Re-submitting filters left the pager unchanged ({after})")
+        return True
+
+    print(f"  ⚠ Table was not filtered: pager {before!r} → {after!r}; checking again")
+    submit_filters(page)
+    again = read_pager(page)["pagerText"]
+    if again == after:
+        print(f"  ✔ Filters now applied to the table ({again})")
+        return True
+    print(f"  ⚠ Pager still changing after re-submit: {after!r} → {again!r}")
+    return False
+
+
+def switch_to_services_view(page):
+    """Show the services view with the bookings filters applied to its table.
+
+    Prefers the in-page Ajax toggle, which keeps the filter state and skips a
+    full load of the admin app. Falls back to loading SERVICES_URL, and
+    re-applies the filters there if they did not survive. Either way the
+    form values are checked first, then the table itself.
+    """
+    sent_posts = []
+    if ajax_switch_view(page, "services", sent_posts):
+        state = read_filter_state(page)
+        if not filters_match(state):
+            print(f"  ⚠ Filters changed by the view switch: {state}")
+        elif table_reflects_filters(page, sent_posts):
+            print("  ✔ Services view via Ajax, filters applied")
+            return
+
+    print(f"  → Loading {SERVICES_URL}")
+    safe_goto(page, SERVICES_URL)
+    wait_for_ajax(page)
+    state = read_filter_state(page)
+    if filters_match(state) and table_reflects_filters(page):
+        print("  ✔ Services view loaded, filters applied")
+        return
+
+    print(f"  ⚠ Filters not carried over ({state}) — re-applying")
+    set_filters(page)
+    state = read_filter_state(page)
+    if not filters_match(state):
+        screenshot(page, "services_filters_mismatch")
+        raise RuntimeError(f"Services view does not reflect the applied filters: {state}")
+    print("  ✔ Filters re-applied on services view")
 
 
 def export_excel(page, filepath, label):
@@ -444,25 +1488,136 @@ def export_excel(page, filepath, label):
     # Open the Exportar dropdown
     exportar_btn = page.locator("button:has-text('Exportar'), a:has-text('Exportar')")
     try:
-        exportar_btn.first.click(timeout=CLICK_TIMEOUT)
+        BUDGET.timed(
+            "click", f"Exportar ({label})",
+            lambda t: exportar_btn.first.click(timeout=t),
+        )
     except PwTimeout:
         js_click(page, "[id$='exportButton']")
 
-    time.sleep(0.5)
+    BUDGET.sleep(0.5)
 
     # Click "Excel" in the dropdown and catch the download
-    with page.expect_download(timeout=NAV_TIMEOUT) as download_info:
+    start = time.monotonic()
+    with page.expect_download(timeout=BUDGET.timeout("download", label)) as download_info:
         excel_link = page.locator("a:has-text('Excel'), li:has-text('Excel') a")
         try:
-            excel_link.first.click(timeout=CLICK_TIMEOUT)
+            BUDGET.timed(
+                "click", f"Excel ({label})",
+                lambda t: excel_link.first.click(timeout=t),
+            )
         except PwTimeout:
-            page.get_by_role("link", name="Excel").click(timeout=CLICK_TIMEOUT)
+            BUDGET.timed(
+                "click", f"Excel link ({label})",
+                lambda t: page.get_by_role("link", name="Excel").click(timeout=t),
+            )
 
     download = download_info.value
+    BUDGET.record("download", label, (time.monotonic() - start) * 1000)
     download.save_as(filepath)
+    if NETWORK_MODE == "record":
+        store_recorded_download(download.url, filepath)
     print(f"  ✅ Saved: {filepath}")
 
 
+# ======================================================
+# POST-PROCESSING
+# ======================================================
+
+def _workbook_rows(filepath):
+    """Non-empty rows of the first sheet, header included."""
+    wb = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        return [
+            row for row in wb.worksheets[0].iter_rows(values_only=True)
+            if any(cell not in (None, "") for cell in row)
+        ]
+    finally:
+        wb.close()
+
+
+def count_data_rows(rows):
+    """Data rows below the header, wherever the header sits.
+
+    The header is the first row filled across more than half the table width
+    with text only; title or metadata rows above it (a single cell, say) are
+    skipped. Without such a row every row counts as data.
+    """
+    width = max((sum(c not in (None, "") for c in row) for row in rows), default=0)
+    for index, row in enumerate(rows):
+        cells = [c for c in row if c not in (None, "")]
+        if len(cells) > width // 2 and all(isinstance(c, str) for c in cells):
+            return len(rows) - index - 1
+    return len(rows)
+
+
+def _convert_workbook(filepath, expected):
+    rows = _workbook_rows(filepath)
+    csv_path = os.path.splitext(filepath)[0] + ".csv"
+    with open(csv_path, "w", newline="", encoding="utf-8-sig") as f:
+        csv.writer(f).writerows(rows)
+    return f"{len(rows)} rows → {os.path.basename(csv_path)}"
+
+
+def _validate_workbook(filepath, expected):
+    count = count_data_rows(_workbook_rows(filepath))
+    if expected is None:
+        return f"{count} data rows (no pager total to compare)"
+    if count != expected:
+        raise ValueError(f"{count} data rows but the pager reported {expected}")
+    return f"{count} data rows match pager"
+
+
+def _compress_workbook(filepath, expected):
+    gz_path = filepath + ".gz"
+    with open(filepath, "rb") as src, gzip.open(gz_path, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    return f"{os.path.getsize(filepath)} → {os.path.getsize(gz_path)} bytes"
+
+
+_POSTPROCESS_HANDLERS = {
+    "convert": _convert_workbook,
+    "validate": _validate_workbook,
+    "compress": _compress_workbook,
+}
+
+
+def _run_postprocess_task(task, filepath, expected):
+    """Process-pool entry point: run one task on one file and time it."""
+    start = time.perf_counter()
+    try:
+        detail, error = _POSTPROCESS_HANDLERS[task](filepath, expected), None
+    except Exception as e:
+        detail, error = None, f"{type(e).__name__}: {e}"
+    return task, filepath, time.perf_counter() - start, detail, error
+
+
+def postprocess_exports(expected_totals):
+    """Convert, validate and compress each workbook in parallel.
+
+    expected_totals maps workbook path → pager total (or None). One worker runs
+    per file and task; the first failure raises right away, without waiting
+    for the tasks still running.
+    """
+    print("[post] Processing exported workbooks...")
+    jobs = [
+        (task, filepath, expected)
+        for filepath, expected in expected_totals.items()
+        for task in POSTPROCESS_TASKS
+    ]
+    # No `with` block: its exit would wait for every worker before the error surfaces
+    pool = ProcessPoolExecutor(max_workers=len(jobs))
+    futures = [pool.submit(_run_postprocess_task, *job) for job in jobs]
+    for future in as_completed(futures):
+        task, filepath, seconds, detail, error = future.result()
+        name = os.path.basename(filepath)
+        if error:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise RuntimeError(f"Post-processing '{task}' failed for {name}: {error}")
+        print(f"  ✔ {task:<8} {name} ({seconds:.2f}s) — {detail}")
+    pool.shutdown()
+
+
 # ======================================================
 # MAIN
 # ======================================================
@@ -474,40 +1629,84 @@ def run():
     print(f"Dates: {DATE_FROM} → {DATE_TO}")
     print("=" * 60)
 
+    if NETWORK_MODE:
+        print(f"Network mode: {NETWORK_MODE} ({HAR_FILE})")
+
+    context_options = {}
+    if NETWORK_MODE == "record":
+        context_options = {"record_har_path": HAR_FILE, "record_har_content": "embed"}
+
+    print(f"Browser profile: {'lean' if LEAN_BROWSER else 'default'}"
+          f"{', single renderer' if SINGLE_RENDERER else ''}")
+    memory = MemorySampler().start()
+    BUDGET.start()
+    print(f"Run deadline: {RUN_DEADLINE_SECS:.0f}s")
+
     with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
+        browser = p.chromium.launch(**browser_launch_options())
         context = browser.new_context(
             accept_downloads=True,
-            viewport={"width": 1920, "height": 1080},
+            viewport=LEAN_VIEWPORT if LEAN_BROWSER else DEFAULT_VIEWPORT,
+            **context_options,
         )
+        replay_misses = None
+        if NETWORK_MODE == "replay":
+            replay_misses = install_replay(context, HAR_FILE, REPLAY_TIME_SCALE)
         page = context.new_page()
         page.set_default_timeout(AJAX_TIMEOUT)
 
         try:
+            BUDGET.begin_step("login", page)
             login(page)
-            apply_filters(page)
+            BUDGET.begin_step("filters")
+            bookings_total = apply_filters(page)
 
             # ── Export 1: Bookings (default view) ──
             print("[3/4] Exporting Bookings...")
+            BUDGET.begin_step("export_bookings")
             export_excel(page, BOOKINGS_FILE, "BOOKINGS")
 
             # ── Export 2: Services / Alojamiento ──
             print("[4/4] Switching to services view and exporting...")
-            safe_goto(page, SERVICES_URL)
-            wait_for_ajax(page)
+            BUDGET.begin_step("export_services")
+            switch_to_services_view(page)
             screenshot(page, "06_services_view")
+            services_pager = read_pager(page)
+            print(f"  Services pager: {services_pager['pagerText']}")
             export_excel(page, SERVICES_FILE, "SERVICES")
 
             # ── Filter log ──
             save_filter_params()
 
+        except BudgetExhausted as e:
+            # A short, bounded overrun for the diagnostic screenshot
+            page.set_default_timeout(5_000)
+            screenshot(page, "BUDGET_EXHAUSTED")
+            print(f"  ❌ {e}")
+            raise
         except Exception:
             screenshot(page, "CRASH")
             traceback.print_exc()
             raise
         finally:
+            # Replayed latencies say nothing about the live site
+            if NETWORK_MODE != "replay":
+                BUDGET.save()
             context.close()
             browser.close()
+            # The HAR is only written out when the context closes
+            if NETWORK_MODE == "record" and os.path.exists(HAR_FILE):
+                redact_har(HAR_FILE)
+            if replay_misses:
+                print(f"  ⚠ {len(replay_misses)} request(s) not found in HAR, e.g. {replay_misses[0]}")
+            memory.stop()
+            memory.report()
+
+    if POSTPROCESS:
+        postprocess_exports({
+            BOOKINGS_FILE: bookings_total,
+            SERVICES_FILE: parse_pager_total(services_pager["pagerText"]),
+        })
 
     print("=" * 60)
     print("DONE ✅")
@@ -0,0 +1,139 @@
+"""Minimal local fake of the Drive v3 endpoints used by upload_to_drive.py.
+
+Serves files.list (with pageSize / pageToken paging) and batch requests
+(POST /batch/drive/v3) carrying files.update and files.delete calls.
+Point the client at it with DRIVE_API_ENDPOINT = FakeDrive.endpoint.
+"""
+
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class FakeDrive:
+    def __init__(self):
+        self.files = {}
+        self.batch_sizes = []
+        self.list_calls = 0
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def add(self, file_id, name, created_time, parent):
+        self.files[file_id] = {
+            'id': file_id,
+            'name': name,
+            'createdTime': created_time,
+            'parents': [parent],
+            'trashed': False,
+        }
+
+    def names_in(self, parent):
+        return sorted(
+            f['name'] for f in self.files.values()
+            if parent in f['parents'] and not f['trashed']
+        )
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _list(self, query):
+        folder = re.search(r"'([^']+)' in parents", query['q'][0]).group(1)
+        ids = sorted(
+            f['id'] for f in self.files.values()
+            if folder in f['parents'] and not f['trashed']
+        )
+        start = int(query.get('pageToken', ['0'])[0])
+        size = int(query.get('pageSize', ['100'])[0])
+        body = {
+            'files': [
+                {k: self.files[i][k] for k in ('id', 'name', 'createdTime')}
+                for i in ids[start:start + size]
+            ]
+        }
+        if start + size < len(ids):
+            body['nextPageToken'] = str(start + size)
+        self.list_calls += 1
+        return body
+
+    def _apply(self, method, path, body):
+        url = urlparse(path)
+        file_id = url.path.rsplit('/', 1)[-1]
+        query = parse_qs(url.query)
+        if file_id not in self.files:
+            return 404, {'error': {'code': 404, 'message': 'File not found'}}
+        if method == 'DELETE':
+            del self.files[file_id]
+            return 204, None
+        f = self.files[file_id]
+        if body.get('trashed'):
+            f['trashed'] = True
+        if 'removeParents' in query:
+            f['parents'] = [p for p in f['parents'] if p != query['removeParents'][0]]
+        if 'addParents' in query:
+            f['parents'].append(query['addParents'][0])
+        return 200, {'id': file_id}
+
+    def _batch(self, content_type, raw):
+        boundary = re.search(r'boundary="?([^";]+)', content_type).group(1)
+        raw = raw.replace('\r\n', '\n')
+        parts = [p for p in raw.split(f"--{boundary}") if 'Content-ID' in p]
+        self.batch_sizes.append(len(parts))
+        out = []
+        for part in parts:
+            # The client folds long headers, so the id may span lines
+            content_id = ' '.join(re.search(r'Content-ID: <([^>]+)>', part).group(1).split())
+            # Part headers, blank line, then the embedded HTTP request
+            http_request = part.split('\n\n', 1)[1]
+            head, _, body = http_request.partition('\n\n')
+            method, path = head.split(' ')[:2]
+            status, result = self._apply(method, path, json.loads(body) if body.strip() else {})
+            if result is None:
+                response = f"HTTP/1.1 {status} No Content\r\nContent-Length: 0\r\n\r\n\r\n"
+            else:
+                payload = json.dumps(result)
+                response = (
+                    f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n\r\n{payload}"
+                )
+            out.append(
+                f"--batch_out\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n{response}\r\n"
+            )
+        return ''.join(out) + '--batch_out--'
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, content_type, body):
+                data = body.encode()
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                self._send('application/json', json.dumps(fake._list(parse_qs(url.query))))
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers['Content-Length'])).decode()
+                body = fake._batch(self.headers['Content-Type'], raw)
+                self._send('multipart/mixed; boundary=batch_out', body)
+
+        return Handler
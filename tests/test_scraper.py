@@ -0,0 +1,284 @@
+import json
+import os
+import sys
+from urllib.parse import quote, quote_plus
+
+import pytest
+
+pytest.importorskip('playwright')
+pytest.importorskip('openpyxl')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MITIKA_USERNAME', 'agent@example.com')
+os.environ.setdefault('MITIKA_PASSWORD', 'not-the-real-one')
+
+import scraper  # noqa: E402
+
+
+# ── redact_har ──
+
+def js_encode(value):
+    """What encodeURIComponent produces (PrimeFaces Ajax form posts)."""
+    return quote(value, safe="-_.!~*'()")
+
+
+def write_har(path, password, username='agent@example.com'):
+    text = '&'.join([
+        'login-form=login-form',
+        f"login-form%3Alogin-content%3Alogin%3AEmail={js_encode(username)}",
+        f"login-form%3Alogin-content%3Alogin%3Aj_password={js_encode(password)}",
+    ])
+    har = {'log': {'entries': [
+        {
+            'request': {
+                'method': 'POST',
+                'url': 'https://mitika.travel/login.xhtml;jsessionid=ABC123DEF',
+                'headers': [{'name': 'Cookie', 'value': 'JSESSIONID=ABC123DEF'}],
+                'cookies': [{'name': 'JSESSIONID', 'value': 'ABC123DEF'}],
+                'postData': {
+                    'mimeType': 'application/x-www-form-urlencoded; charset=UTF-8',
+                    'text': text,
+                    'params': [{'name': 'login-form:login-content:login:j_password',
+                                'value': js_encode(password)}],
+                },
+            },
+            'response': {
+                'status': 200,
+                'headers': [],
+                'cookies': [],
+                'content': {'text': f'<a href="/home;jsessionid=ABC123DEF">{password}</a>'},
+            },
+        },
+        {
+            'request': {'method': 'GET', 'url': f'https://mitika.travel/x?p={quote_plus(password)}',
+                        'headers': [], 'cookies': []},
+            'response': {'status': 200, 'headers': [], 'cookies': [], 'content': {'text': ''}},
+        },
+    ]}}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(har, f)
+
+
+@pytest.mark.parametrize('password', [
+    "P@ss!w(rd)",
+    "a'b*c~d e+f&g=h",
+    "ñandú€%20(x)",
+    "!!~~**''()",
+])
+def test_redact_har_removes_every_password_encoding(tmp_path, monkeypatch, password):
+    monkeypatch.setattr(scraper, 'PASSWORD', password)
+    monkeypatch.setattr(scraper, 'USERNAME', 'agent@example.com')
+    path = tmp_path / 'session.har'
+    write_har(path, password)
+
+    scraper.redact_har(str(path))
+
+    text = path.read_text(encoding='utf-8')
+    raw = json.loads(text)
+    dumped = json.dumps(raw, ensure_ascii=False)
+    for form in {password, quote(password, safe=''), quote_plus(password), js_encode(password)}:
+        assert form not in dumped
+    assert 'agent@example.com' not in dumped and 'agent%40example.com' not in dumped
+    assert 'ABC123DEF' not in dumped
+    assert raw['log']['entries'][0]['request']['url'].endswith(';jsessionid=REDACTED')
+
+
+# ── count_data_rows / parse_pager_total ──
+
+@pytest.mark.parametrize('rows, expected', [
+    ([('Localizador', 'Cliente', 'Importe'), ('A1', 'Ana', 10), ('A2', 'Luis', 20)], 2),
+    ([('Reservas',), ('Localizador', 'Cliente', 'Importe'), ('A1', 'Ana', 10)], 1),
+    ([('Exportado 19/10/2026',), ('Filtros: Reservado',), ('Loc', 'Cliente'), ('A1', 'Ana')], 1),
+    ([('Localizador', 'Cliente', 'Importe')], 0),
+    ([(1, 2), (3, 4)], 2),
+    ([], 0),
+])
+def test_count_data_rows_finds_the_header(rows, expected):
+    assert scraper.count_data_rows(rows) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('1 - 20 de 1.234', 1234),
+    ('Mostrando 1-50 of 345 registros', 345),
+    ('21 a 40 de 97', 97),
+    ('(1 de 12)', None),
+    ('Página 1 de 12', None),
+    ('Page 2 of 3', None),
+    ('no pager', None),
+])
+def test_parse_pager_total(text, expected):
+    assert scraper.parse_pager_total(text) == expected
+
+
+# ── RunBudget.adaptive_ms ──
+
+@pytest.mark.parametrize('kind, samples, expected', [
+    ('nav', [], scraper.NAV_TIMEOUT),
+    ('nav', [1_000] * 4, scraper.NAV_TIMEOUT),
+    ('nav', [5_000] * 10, 20_000),
+    ('nav', [100] * 10, 10_000),
+    ('nav', [50_000] * 10, scraper.NAV_TIMEOUT),
+    ('click', [500] * 19 + [2_000], 8_000),
+    ('download', [1_000] * 10, 15_000),
+    # Waits that swallow their timeout never shrink, however fast they were
+    ('ajax', [10] * 50, scraper.AJAX_TIMEOUT),
+    ('idle', [10] * 50, scraper.IDLE_TIMEOUT),
+    ('form', [10] * 50, scraper.AJAX_TIMEOUT),
+    ('settle', [10] * 50, scraper.NAV_TIMEOUT),
+])
+def test_adaptive_ms(tmp_path, kind, samples, expected):
+    budget = scraper.RunBudget(900, str(tmp_path / 'latency.json'))
+    budget.start()
+    budget.history = {kind: samples}
+
+    assert budget.adaptive_ms(kind) == expected
+
+
+def test_budget_timeout_is_capped_by_remaining_time_and_raises_when_spent(tmp_path):
+    budget = scraper.RunBudget(0.05, str(tmp_path / 'latency.json'))
+    budget.start()
+
+    assert 1 <= budget.timeout('ajax') <= 50
+    budget.started -= 1
+    with pytest.raises(scraper.BudgetExhausted):
+        budget.timeout('ajax', 'PrimeFaces queue')
+
+
+# ── post_carries_filters ──
+
+def test_post_carries_filters():
+    from urllib.parse import urlencode
+
+    filtered = urlencode({
+        'javax.faces.source': 'view-form:services',
+        'search-form:booking-filters:departureDateFrom_input': scraper.DATE_FROM,
+        'search-form:booking-filters:departureDateTo_input': scraper.DATE_TO,
+    })
+    toggle_only = urlencode({'javax.faces.source': 'view-form:services'})
+
+    assert scraper.post_carries_filters(filtered)
+    assert not scraper.post_carries_filters(toggle_only)
+    assert not scraper.post_carries_filters(None)
+
+
+# ── login response classification ──
+
+class FakeRequest:
+    def __init__(self, post_data=None, method='POST'):
+        self.post_data = post_data
+        self.method = method
+
+
+class FakeResponse:
+    def __init__(self, status=200, body='', location=None, post_data=None,
+                 url='https://mitika.travel/login.xhtml'):
+        self.status = status
+        self.url = url
+        self.request = FakeRequest(post_data)
+        self._body = body
+        self._location = location
+
+    def header_value(self, name):
+        return self._location if name == 'location' else None
+
+    def text(self):
+        if 300 <= self.status < 400:
+            raise RuntimeError('Response body is unavailable for redirect responses')
+        return self._body
+
+
+def partial(*updates, redirect=None):
+    changes = ''.join(f'<update id="{i}"><![CDATA[{html}]]></update>' for i, html in updates)
+    if redirect:
+        return f'<partial-response><redirect url="{redirect}"/></partial-response>'
+    return f'<partial-response><changes>{changes}</changes></partial-response>'
+
+
+LOGIN_FORM = (
+    '<form id="login-form">'
+    '<input id="login-form:login-content:login:Email" type="text">'
+    '<input id="login-form:login-content:login:j_password" type="password">'
+    '</form>'
+)
+
+
+@pytest.mark.parametrize('response, outcome', [
+    # Success
+    (FakeResponse(302, location='https://mitika.travel/home?tripId=64'),
+     'https://mitika.travel/home?tripId=64'),
+    (FakeResponse(200, partial(redirect='/home?tripId=64&amp;x=1')), '/home?tripId=64&x=1'),
+    (FakeResponse(200, '<html><div class="banner">Mantenimiento programado</div>'
+                       '<footer>Protected by reCAPTCHA</footer></html>',
+                  location='/home'), '/home'),
+    # Inconclusive: caller falls back to the URL check
+    (FakeResponse(200, '<html><div class="banner">Mantenimiento programado el domingo</div>'
+                       + LOGIN_FORM + '<div id="login-form:messages"></div></html>'), None),
+    # Bad credentials
+    (FakeResponse(302, location='/login.xhtml?error=1'), scraper.BadCredentialsError),
+    (FakeResponse(200, partial(('login-form:messages',
+                                '<div class="ui-messages-error">Usuario o contraseña incorrectos</div>')
+                               )), scraper.BadCredentialsError),
+    (FakeResponse(200, '<script>PrimeFaces.cw("Growl","growl",{msgs:[{summary:"Cuenta bloqueada",'
+                       'severity:"error"}]});</script>' + LOGIN_FORM), scraper.BadCredentialsError),
+    # Maintenance / slow server / other errors
+    (FakeResponse(503), scraper.MaintenanceError),
+    (FakeResponse(502), scraper.MaintenanceError),
+    (FakeResponse(504), scraper.SlowServerError),
+    (FakeResponse(500), scraper.LoginError),
+    # Challenges, recognised by structure, before any redirect counts as success
+    (FakeResponse(302, location='https://mitika.travel/auth/2fa?next=/home'),
+     scraper.LoginChallengeError),
+    (FakeResponse(200, partial(redirect='/account/verify-code')), scraper.LoginChallengeError),
+    (FakeResponse(200, partial(('login-form', LOGIN_FORM + '<div class="g-recaptcha" data-sitekey="k"></div>'))),
+     scraper.LoginChallengeError),
+    (FakeResponse(200, partial(('login-form', '<iframe src="https://www.google.com/recaptcha/api2/anchor"></iframe>'))),
+     scraper.LoginChallengeError),
+    (FakeResponse(200, partial(('login-form', '<input id="login-form:otpCode" type="text">'))),
+     scraper.LoginChallengeError),
+    (FakeResponse(200, '<form><input name="code" autocomplete="one-time-code"></form>'),
+     scraper.LoginChallengeError),
+    # An invisible reCAPTCHA on the plain login form is not a challenge
+    (FakeResponse(200, LOGIN_FORM + '<div class="g-recaptcha" data-size="invisible"></div>'), None),
+])
+def test_classify_login_response(response, outcome):
+    if isinstance(outcome, type) and issubclass(outcome, Exception):
+        with pytest.raises(outcome) as raised:
+            scraper.classify_login_response(response)
+        # Subclasses must not be mistaken for each other
+        if outcome is not scraper.LoginError:
+            assert type(raised.value) is outcome
+    else:
+        assert scraper.classify_login_response(response) == outcome
+
+
+@pytest.mark.parametrize('body, expected', [
+    (partial(('login-form:messages', '<span>Usuario o contraseña incorrectos</span>')),
+     'Usuario o contraseña incorrectos'),
+    ('<div class="ui-messages ui-widget"><div class="ui-messages-warn">'
+     '<span class="ui-messages-warn-summary">Complete el captcha</span></div></div>'
+     '<p>Texto fuera</p>', 'Complete el captcha'),
+    ('<script>PrimeFaces.cw("Growl","g",{msgs:[{summary:"Error",detail:"Clave caducada"}]});</script>',
+     'Error Clave caducada'),
+    ('<div class="banner">Mantenimiento programado</div><footer>reCAPTCHA</footer>', ''),
+])
+def test_login_messages(body, expected):
+    assert scraper.login_messages(body) == expected
+
+
+@pytest.mark.parametrize('method, post_data, expected', [
+    ('POST', 'login-form=login-form&login-form%3Alogin-content%3Alogin%3AEmail=a%40b.c', True),
+    ('POST', 'javax.faces.partial.ajax=true&javax.faces.source=login-form%3Anext'
+             '&javax.faces.partial.event=click&login-form=login-form', True),
+    ('POST', 'javax.faces.partial.ajax=true'
+             '&javax.faces.source=login-form%3Alogin-content%3Alogin%3AEmail'
+             '&javax.faces.partial.event=blur&login-form=login-form', False),
+    ('POST', 'jakarta.faces.source=login-form%3Alogin-content%3Alogin%3Aj_password'
+             '&login-form=login-form', False),
+    ('POST', 'search-form=search-form', False),
+    ('GET', 'login-form=login-form', False),
+])
+def test_is_login_submit(method, post_data, expected):
+    response = FakeResponse(post_data=post_data)
+    response.request.method = method
+
+    assert scraper._is_login_submit(response) is expected
@@ -0,0 +1,105 @@
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import upload_to_drive  # noqa: E402
+from fake_drive import FakeDrive  # noqa: E402
+
+TODAY = date(2026, 10, 19)
+
+
+def export_files(days, runs=('0700', '1500')):
+    """Two runs a day of BOOKINGS + FILTER_PARAMS exports, newest first."""
+    files = []
+    for i in range(days):
+        day = TODAY - timedelta(days=i)
+        for hhmm in runs:
+            for prefix, ext in (('BOOKINGS_', 'xlsx'), ('FILTER_PARAMS_', 'txt')):
+                files.append({
+                    'id': f"{prefix}{day}_{hhmm}",
+                    'name': f"{prefix}{day:%Y_%m_%d}_{hhmm}.{ext}",
+                    'createdTime': f"{day}T10:00:00Z",
+                })
+    return files
+
+
+@pytest.fixture
+def drive(monkeypatch):
+    fake = FakeDrive().start()
+    monkeypatch.setattr(upload_to_drive, 'DRIVE_API_ENDPOINT', fake.endpoint)
+    for key in ('DRIVE_ARCHIVE_FOLDER_ID', 'DRIVE_ROTATE_PERMANENT', 'DRIVE_ROTATE_DRY_RUN'):
+        monkeypatch.delenv(key, raising=False)
+    monkeypatch.setenv('DRIVE_KEEP_DAILY', '7')
+    monkeypatch.setenv('DRIVE_KEEP_MONTHLY', '3')
+    for f in export_files(400):
+        fake.add(f['id'], f['name'], f['createdTime'], 'FOLDER')
+    fake.add('notes', 'notes.txt', '2020-01-01T00:00:00Z', 'FOLDER')
+    yield fake
+    fake.stop()
+
+
+def test_select_keeps_newest_per_day_and_month():
+    keep, rotate = upload_to_drive.select_for_rotation(export_files(100), 7, 3)
+
+    kept = sorted(f['name'] for f in keep if f['name'].startswith('BOOKINGS_'))
+    assert kept == [
+        'BOOKINGS_2026_08_31_1500.xlsx',
+        'BOOKINGS_2026_09_30_1500.xlsx',
+    ] + [f"BOOKINGS_2026_10_{d}_1500.xlsx" for d in range(13, 20)]
+    assert len(keep) + len(rotate) == 400
+
+
+def test_select_ignores_unknown_files_and_falls_back_to_created_time():
+    files = [
+        {'id': 'a', 'name': 'notes.txt', 'createdTime': '2020-01-01T00:00:00Z'},
+        {'id': 'b', 'name': 'BOOKINGS_manual.xlsx', 'createdTime': '2026-10-01T00:00:00Z'},
+        {'id': 'c', 'name': 'BOOKINGS_old.xlsx', 'createdTime': '2026-09-01T00:00:00Z'},
+    ]
+    keep, rotate = upload_to_drive.select_for_rotation(files, 1, 0)
+
+    assert [f['id'] for f in keep] == ['b']
+    assert [f['id'] for f in rotate] == ['c']
+
+
+def test_rotate_trashes_in_batches(drive):
+    upload_to_drive.rotate_folder('FOLDER')
+
+    remaining = drive.names_in('FOLDER')
+    assert len(remaining) == 2 * 9 + 1
+    assert 'notes.txt' in remaining
+    # Trashed, not deleted
+    assert len(drive.files) == 1601
+    assert drive.list_calls == 2
+    assert max(drive.batch_sizes) == upload_to_drive.BATCH_SIZE
+    assert sum(drive.batch_sizes) == 1600 - 18
+
+
+def test_rotate_archives_to_folder(drive, monkeypatch):
+    monkeypatch.setenv('DRIVE_ARCHIVE_FOLDER_ID', 'ARCHIVE')
+
+    upload_to_drive.rotate_folder('FOLDER')
+
+    assert len(drive.names_in('FOLDER')) == 19
+    assert len(drive.names_in('ARCHIVE')) == 1600 - 18
+
+
+def test_rotate_permanent_delete_needs_flag(drive, monkeypatch):
+    monkeypatch.setenv('DRIVE_ROTATE_PERMANENT', '1')
+
+    upload_to_drive.rotate_folder('FOLDER')
+
+    assert len(drive.files) == 19
+
+
+def test_rotate_dry_run_changes_nothing(drive, monkeypatch):
+    monkeypatch.setenv('DRIVE_ROTATE_DRY_RUN', '1')
+
+    upload_to_drive.rotate_folder('FOLDER')
+
+    assert len(drive.names_in('FOLDER')) == 1601
+    assert drive.batch_sizes == []
@@ -1,12 +1,24 @@
 import os
+import re
 import sys
+from datetime import date
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import BatchHttpRequest, MediaFileUpload
 
 SCOPES = ['https://www.googleapis.com/auth/drive']
 
+# Point at a local fake Drive server (e.g. http://127.0.0.1:8765) to run without Google
+DRIVE_API_ENDPOINT = os.environ.get('DRIVE_API_ENDPOINT', '').rstrip('/')
+
+# Rotation
+ROTATED_PREFIXES = ('BOOKINGS_', 'FILTER_PARAMS_')
+STAMP_RE = re.compile(r'_(\d{4})_(\d{2})_(\d{2})(?:_\d{4})?\.\w+$')
+LIST_PAGE_SIZE = 1000
+BATCH_SIZE = 100  # Drive's limit of calls per batch request
+
 
 def authenticate():
     """Authenticate using OAuth refresh token (works with personal Google accounts)."""
@@ -33,9 +45,37 @@ def authenticate():
     return creds
 
 
+def build_service():
+    """Drive v3 client, against Google or the DRIVE_API_ENDPOINT fake."""
+    if DRIVE_API_ENDPOINT:
+        return build(
+            'drive', 'v3',
+            credentials=AnonymousCredentials(),
+            client_options={'api_endpoint': f"{DRIVE_API_ENDPOINT}/drive/v3/"},
+        )
+    return build('drive', 'v3', credentials=authenticate())
+
+
+def new_batch(service, callback):
+    """Batch request; the discovery batch URI always targets Google, so override it for the fake."""
+    if DRIVE_API_ENDPOINT:
+        return BatchHttpRequest(callback=callback, batch_uri=f"{DRIVE_API_ENDPOINT}/batch/drive/v3")
+    return service.new_batch_http_request(callback=callback)
+
+
+def normalize_folder_id(folder_id):
+    """Accept a bare folder ID or a drive.google.com folder URL."""
+    folder_id = folder_id.strip()
+    if "drive.google.com" in folder_id:
+        parts = folder_id.split("/")
+        folder_id = [p for p in parts if p.strip()][-1]
+        if "?" in folder_id:
+            folder_id = folder_id.split("?")[0]
+    return folder_id
+
+
 def upload_file(file_path, folder_id=None):
-    creds = authenticate()
-    service = build('drive', 'v3', credentials=creds)
+    service = build_service()
 
     # Print account info for debugging
     try:
@@ -45,12 +85,7 @@ def upload_file(file_path, folder_id=None):
         print(f"Could not determine account details: {e}")
 
     if folder_id:
-        folder_id = folder_id.strip()
-        if "drive.google.com" in folder_id:
-            parts = folder_id.split("/")
-            folder_id = [p for p in parts if p.strip()][-1]
-            if "?" in folder_id:
-                folder_id = folder_id.split("?")[0]
+        folder_id = normalize_folder_id(folder_id)
 
         masked_id = folder_id[:4] + "..." + folder_id[-4:] if len(folder_id) > 8 else "***"
         print(f"Using Folder ID: {masked_id}")
@@ -101,11 +136,145 @@ def upload_file(file_path, folder_id=None):
         sys.exit(1)
 
 
+def list_folder(service, folder_id):
+    """All non-trashed files in a folder, following nextPageToken."""
+    files = []
+    page_token = None
+    while True:
+        results = service.files().list(
+            q=f"'{folder_id}' in parents and trashed = false",
+            fields='nextPageToken, files(id, name, createdTime)',
+            pageSize=LIST_PAGE_SIZE,
+            pageToken=page_token,
+        ).execute()
+        files.extend(results.get('files', []))
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            return files
+
+
+def file_date(file):
+    """Date from the BOOKINGS_YYYY_MM_DD_HHMM-style stamp, else from createdTime."""
+    match = STAMP_RE.search(file['name'])
+    if match:
+        return date(*map(int, match.groups()))
+    return date.fromisoformat(file['createdTime'][:10])
+
+
+def select_for_rotation(files, keep_daily, keep_monthly):
+    """Split exported files into (keep, rotate) under the retention policy.
+
+    Per export type, the newest file of each of the `keep_daily` most recent
+    days is kept, plus the newest file of each of the `keep_monthly` most
+    recent months. Files without a known export prefix are never touched.
+    """
+    keep, rotate = [], []
+    for prefix in ROTATED_PREFIXES:
+        exports = [f for f in files if f['name'].startswith(prefix)]
+        # Newest first: the stamp sorts chronologically, createdTime breaks ties
+        exports.sort(key=lambda f: (file_date(f), f['name'], f.get('createdTime', '')), reverse=True)
+
+        newest_per_day, newest_per_month = {}, {}
+        for f in exports:
+            day = file_date(f)
+            newest_per_day.setdefault(day, f)
+            newest_per_month.setdefault((day.year, day.month), f)
+
+        kept_ids = {f['id'] for f in list(newest_per_day.values())[:keep_daily]}
+        kept_ids |= {f['id'] for f in list(newest_per_month.values())[:keep_monthly]}
+        for f in exports:
+            (keep if f['id'] in kept_ids else rotate).append(f)
+    return keep, rotate
+
+
+def apply_rotation(service, files, folder_id, action='trash', archive_folder_id=None):
+    """Trash, archive or permanently delete files, BATCH_SIZE calls per HTTP request.
+
+    action is 'trash' (recoverable from Drive's trash for 30 days), 'archive'
+    (moved to archive_folder_id) or 'delete' (permanent, skips the trash).
+    """
+    errors = []
+
+    def callback(request_id, response, exception):
+        if exception is not None:
+            errors.append((request_id, exception))
+
+    for start in range(0, len(files), BATCH_SIZE):
+        batch = new_batch(service, callback)
+        for f in files[start:start + BATCH_SIZE]:
+            if action == 'archive':
+                request = service.files().update(
+                    fileId=f['id'],
+                    addParents=archive_folder_id,
+                    removeParents=folder_id,
+                    fields='id',
+                )
+            elif action == 'delete':
+                request = service.files().delete(fileId=f['id'])
+            else:
+                request = service.files().update(
+                    fileId=f['id'], body={'trashed': True}, fields='id'
+                )
+            batch.add(request, request_id=f['id'])
+        batch.execute()
+    return errors
+
+
+def rotate_folder(folder_id):
+    """Apply the retention policy (DRIVE_KEEP_DAILY / DRIVE_KEEP_MONTHLY) to a folder.
+
+    Rotated files go to the trash unless DRIVE_ARCHIVE_FOLDER_ID is set (move
+    there) or DRIVE_ROTATE_PERMANENT=1 (permanent delete).
+    """
+    keep_daily = int(os.environ.get('DRIVE_KEEP_DAILY', '30'))
+    keep_monthly = int(os.environ.get('DRIVE_KEEP_MONTHLY', '12'))
+    archive_folder_id = os.environ.get('DRIVE_ARCHIVE_FOLDER_ID')
+    permanent = os.environ.get('DRIVE_ROTATE_PERMANENT') == '1'
+    dry_run = os.environ.get('DRIVE_ROTATE_DRY_RUN') == '1'
+
+    service = build_service()
+    folder_id = normalize_folder_id(folder_id)
+    if archive_folder_id:
+        archive_folder_id = normalize_folder_id(archive_folder_id)
+        action = 'archive'
+    else:
+        action = 'delete' if permanent else 'trash'
+
+    files = list_folder(service, folder_id)
+    keep, rotate = select_for_rotation(files, keep_daily, keep_monthly)
+    print(f"Folder has {len(files)} files: keeping {len(keep)}, {action} {len(rotate)} "
+          f"(policy: {keep_daily} daily, {keep_monthly} monthly)")
+    for f in rotate:
+        print(f"  {action}: {f['name']}")
+
+    if dry_run:
+        print("Dry run: nothing changed.")
+        return
+    if not rotate:
+        return
+
+    errors = apply_rotation(service, rotate, folder_id, action, archive_folder_id)
+    if errors:
+        for file_id, exception in errors:
+            print(f"Error: could not {action} {file_id}: {exception}")
+        sys.exit(1)
+    done = {'trash': 'trashed', 'archive': 'archived', 'delete': 'deleted'}[action]
+    print(f"Rotation done: {len(rotate)} files {done}.")
+
+
 if __name__ == '__main__':
     if len(sys.argv) < 2:
         print("Usage: python upload_to_drive.py <file_path> [folder_id]")
+        print("       python upload_to_drive.py --rotate <folder_id>")
         sys.exit(1)
 
+    if sys.argv[1] == '--rotate':
+        if len(sys.argv) < 3:
+            print("Usage: python upload_to_drive.py --rotate <folder_id>")
+            sys.exit(1)
+        rotate_folder(sys.argv[2])
+        sys.exit(0)
+
     file_to_upload = sys.argv[1]
 
     target_folder_id = None